@@ -15,44 +15,204 @@ make encryption possible.
 %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 """
 
+import io
 import os
-import glob
-from datetime import datetime
+import time
+import pathlib
+import threading
+import concurrent.futures
+from datetime import datetime, timezone
 
 import cv2
 import numpy as np
 import pikepdf
 
+from PIL import Image
 from pdf2image import convert_from_path
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4, landscape
-from PyPDF2 import PdfFileWriter, PdfFileReader, PdfFileMerger
-
-
-def set_page(name, orientation):
-    """Create an empty A4 PDF page with `name` based on the `orientation`"""
-
-    if orientation == 'landscape':
-        empty_page = canvas.Canvas(name, pagesize=landscape(A4))
-    else:
-        empty_page = canvas.Canvas(name, pagesize=A4)
-
-    return empty_page
-
-
-def draw_image(canvas_, image, orientation):
-    """Draw given image by scaling to the size of canvas the in the correct orientation
-
-    `canvas_` is the page created with `set_page` function. In case of need,
-    reportlab.pdfgen.canvas can be used to create a custom canvas. However,
-    since this function draws images after scaling to A4 paper dimensions, the
-    drawn image may not be properly scaled to the size of a custom canvas.
+from PyPDF2 import PdfFileMerger
+
+# Numba is optional. When it is available, `blur_image` uses a compiled
+# kernel that fuses noise generation, saturating add and the separable blur
+# into one pass; otherwise it falls back to the OpenCV path.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# A4 paper dimensions in points (portrait width, height).
+A4 = (595.2755905511812, 841.8897637795277)
+
+# Metadata sections of PDF. For more information visit the link below.
+# https://www.adobe.io/open/standards/xmp.html#!adobe/xmp-docs/master/Namespaces.md
+# Dublin Core namespace: dc:title, dc:creator, dc:description, dc:subject, dc:format, dc:rights
+# XMP basic namespace: xmp:CreateDate, xmp:CreatorTool, xmp:ModifyDate, xmp:MetadataDate
+# XMP rights management namespace: xmpRights:WebStatement, xmpRights:Marked
+# XMP media management namespace: xmpMM:DocumentID
+# Only xmp:CreateDate and xmp:ModifyDate change per run, so the constant
+# part of the metadata is built once here instead of on every call.
+_METADATA = {
+    'dc:title': 'Lecture Notes',
+    'dc:creator': 'Serhan Yarkan, Tapir Lab.',  # Author
+    'dc:description': 'Tapir Lab. Fall-2020 Lecture Notes',
+    'dc:subject': 'Probability, statistics, communications...\n\
+            ALL HAIL TAPIR!\n\
+            tapirlab.com',  # Keywords
+    'dc:rights': 'Tapir Lab. License',
+    'xmp:CreatorTool': "Tapir Lab.'s Automatic Watermarking Script",
+    'xmpRights:WebStatement': "http://www.tapirlab.com",
+    }
+
+# Default blur parameters of the batch pipeline. The matching 1D Gaussian
+# kernel is built once at import so per-page `blur_image` calls with the
+# defaults skip kernel construction and go straight to the separable filter.
+_BLUR_KERNEL = (5, 5)
+_BLUR_SIGMA = 0.5
+_GAUSSIAN_1D = cv2.getGaussianKernel(_BLUR_KERNEL[0], _BLUR_SIGMA, ktype=cv2.CV_32F)
+
+# Stripe height of the cache-blocked blur. 128 rows of a 100 DPI A4 page are
+# roughly 128 * 1200 * 3 bytes, i.e. below typical L2 cache sizes, so one
+# stripe stays cached between the noise-add and the blur pass.
+_BLUR_STRIPE_ROWS = 128
+
+# Permissions of user, constructed once and reused for every PDF.
+_PERMISSIONS = pikepdf.Permissions(
+    accessibility=False,
+    extract=False,
+    modify_annotation=False,
+    modify_assembly=False,
+    modify_form=False,
+    modify_other=False,
+    print_lowres=True,
+    print_highres=True,
+    )
+
+# Encryption objects keyed by password pair. A batch run encrypts every PDF
+# with the same credentials, so the keyword-heavy object is built only once.
+_ENCRYPTION_CACHE = {}
+
+
+def _encryption(usr_pass, owner_pass):
+    """Returns the cached pikepdf.Encryption for the given password pair."""
+    key = (usr_pass, owner_pass)
+    if key not in _ENCRYPTION_CACHE:
+        _ENCRYPTION_CACHE[key] = pikepdf.Encryption(user=usr_pass,
+                                                    owner=owner_pass,
+                                                    allow=_PERMISSIONS,
+                                                    )
+    return _ENCRYPTION_CACHE[key]
+
+
+if njit is not None:
+    @njit(fastmath=True, cache=True, nogil=True)
+    def _fused_blur(img, out, gaussian_1d, sigma, seed):
+        """Adds pseudo-random noise and applies the separable blur in one pass.
+
+        The noise is drawn from a per-row xorshift64 generator scaled to
+        [0, 3*sigma], which is a cheap stand-in for the Gaussian noise of
+        the OpenCV path and just as effective at perturbing OCR. The kernel
+        itself is single-threaded: Numba's default workqueue threading layer
+        cannot run a parallel region from the page worker threads, so the
+        kernel releases the GIL instead (`nogil`) and the page thread pool
+        provides the across-core scaling, exactly like the OpenCV path.
+        """
+        height, width, channels = img.shape
+        ksize = gaussian_1d.shape[0]
+        pad = ksize // 2
+        noised = np.empty((height, width, channels), np.float32)
+        scale = np.float32(3.0 * sigma / 255.0)
+        # First pass: per row, generate noise, add with saturation and blur
+        # horizontally into the float32 intermediate.
+        for y in range(height):
+            state = np.uint64(seed) ^ (np.uint64(y + 1) * np.uint64(0x9E3779B97F4A7C15))
+            row = np.empty((width, channels), np.float32)
+            for x in range(width):
+                for c in range(channels):
+                    state ^= state << np.uint64(13)
+                    state ^= state >> np.uint64(7)
+                    state ^= state << np.uint64(17)
+                    noise = np.float32(state & np.uint64(0xFF)) * scale
+                    value = np.float32(img[y, x, c]) + noise
+                    row[x, c] = np.float32(255.0) if value > 255.0 else value
+            for x in range(width):
+                for c in range(channels):
+                    acc = np.float32(0.0)
+                    for k in range(ksize):
+                        xx = x + k - pad
+                        if xx < 0:
+                            xx = 0
+                        elif xx >= width:
+                            xx = width - 1
+                        acc += gaussian_1d[k] * row[xx, c]
+                    noised[y, x, c] = acc
+        # Second pass: blur vertically and saturate back to uint8.
+        for y in range(height):
+            for x in range(width):
+                for c in range(channels):
+                    acc = np.float32(0.0)
+                    for k in range(ksize):
+                        yy = y + k - pad
+                        if yy < 0:
+                            yy = 0
+                        elif yy >= height:
+                            yy = height - 1
+                        acc += gaussian_1d[k] * noised[yy, x, c]
+                    acc += np.float32(0.5)
+                    if acc > 255.0:
+                        acc = np.float32(255.0)
+                    elif acc < 0.0:
+                        acc = np.float32(0.0)
+                    out[y, x, c] = np.uint8(acc)
+
+
+# Lock-free PCG64 generator and the id of the process that owns it. The
+# generator is created lazily in `_ensure_rng` instead of at import: the
+# process pool forks its workers on Linux, and a generator inherited from
+# the parent would hold identical state in every worker.
+_RNG = None
+_RNG_PID = None
+
+# Per-thread storage for the reusable noise buffer of `blur_image` and the
+# OpenCV RNG seeding marker.
+_thread_local = threading.local()
+
+
+def _ensure_rng():
+    """Returns the per-process PCG64 generator, reseeding RNGs after forks.
+
+    OpenCV's global RNG needs the same care as the NumPy generator: it
+    starts from a fixed default seed and is thread-local, so without an
+    explicit reseed every worker process and every page thread would
+    produce byte-identical cv2.randn noise on every run. Both RNGs are
+    therefore reseeded from OS entropy, keyed on the process id (and per
+    thread for OpenCV).
+    """
+    global _RNG, _RNG_PID
+    pid = os.getpid()
+    if _RNG_PID != pid:
+        _RNG = np.random.default_rng()
+        _RNG_PID = pid
+    if getattr(_thread_local, 'cv2_seed_pid', None) != pid:
+        cv2.setRNGSeed(int.from_bytes(os.urandom(4), 'little') & 0x7FFFFFFF)
+        _thread_local.cv2_seed_pid = pid
+    return _RNG
+
+
+def _noise_buffer(shape):
+    """Returns a reusable per-thread uint8 buffer of the requested `shape`.
+
+    The buffer is allocated on first use and grown when a larger page
+    arrives, so each worker thread reuses one allocation for the noise of
+    all of its pages instead of allocating a fresh array per page.
     """
+    buffer = getattr(_thread_local, 'noise_buffer', None)
+    if (buffer is None
+            or buffer.shape[0] < shape[0]
+            or buffer.shape[1] < shape[1]
+            or buffer.shape[2] != shape[2]):
+        buffer = np.empty(shape, dtype=np.uint8)
+        _thread_local.noise_buffer = buffer
 
-    if orientation == 'landscape':
-        canvas_.drawImage(image, 0, 0, width=A4[1], height=A4[0])
-    else:
-        canvas_.drawImage(image, 0, 0, width=A4[0], height=A4[1])
+    return buffer[:shape[0], :shape[1]]
 
 
 def blur_image(page, kernel=(5,5), sigma=1):
@@ -61,23 +221,70 @@ def blur_image(page, kernel=(5,5), sigma=1):
     If `sigma=0` then it is calculated based on kernel size with following:
         sigma = 0.3*((ksize-1)*0.5 - 1) ~~ 1.1 if ksize = 5
 
+    When Numba is installed the whole operation runs in the compiled
+    `_fused_blur` kernel. Otherwise the page is processed with OpenCV in
+    horizontal stripes of `_BLUR_STRIPE_ROWS` rows so the noise-add and the
+    blur of a stripe happen while it is still in cache, instead of
+    streaming the whole page through memory twice.
+
     Args:
-        page (PIL.PngImagePlugin.PngImageFile):
-            Page of PDF that is converted to 'PNG' with
-            `pdf2image.convert_from_path` function.
+        page (PIL.Image.Image or np.ndarray):
+            Page of PDF rasterized with `pdf2image.convert_from_path`,
+            either as the PIL image itself or as its uint8 RGB pixels.
         kernel (tuple, optional): Gaussian blur kernel size. Defaults to (5,5).
         sigma (float, optional): Gaussian blur sigma value. Defaults to 1.
 
     Returns:
         np.ndarray, dtype=np.uint8: Blurred image
     """
-    img = np.asarray(page)  # Convert pages object to numpy array
-    gauss = np.random.normal(0, sigma, img.size)  # Create gaussian noise
-    gauss = gauss.reshape(img.shape[0], img.shape[1], img.shape[2]).astype('uint8')
-    img_gauss = cv2.add(img,gauss)  # Add gaussian noise
-    blurred_image = cv2.GaussianBlur(img_gauss, kernel, sigma)  # Blur image
-
-    return blurred_image
+    # Copy page into a C-contiguous, writable uint8 buffer. A non-contiguous
+    # view (e.g. a rotated or cropped PIL page) would make OpenCV copy
+    # silently on every call and would hand the Numba kernel a hidden copy,
+    # and the in-place stripe updates below require writable storage.
+    img = np.ascontiguousarray(np.array(page, dtype=np.uint8))
+    assert img.flags['C_CONTIGUOUS'] and img.flags.writeable
+    rng = _ensure_rng()  # Reseeds this process/thread after a fork
+    if kernel == _BLUR_KERNEL and sigma == _BLUR_SIGMA:
+        gaussian_1d = _GAUSSIAN_1D  # Precomputed kernel of the default blur
+    else:
+        gaussian_1d = cv2.getGaussianKernel(kernel[0], sigma, ktype=cv2.CV_32F)
+    if njit is not None:
+        # Fused compiled kernel: noise, add and blur in one pass. The kernel
+        # releases the GIL, so the page thread pool runs one instance per
+        # worker thread concurrently.
+        blurred = np.empty_like(img)
+        seed = rng.integers(0, np.iinfo(np.uint64).max, dtype=np.uint64)
+        _fused_blur(img, blurred,
+                    np.ascontiguousarray(gaussian_1d.ravel(), dtype=np.float32),
+                    np.float32(sigma), seed)
+        return blurred
+
+    pad = gaussian_1d.shape[0] // 2  # Halo rows read by the vertical pass
+    height = img.shape[0]
+    blurred = np.empty_like(img)
+
+    noised_until = 0  # Number of rows that already carry noise
+    for row in range(0, height, _BLUR_STRIPE_ROWS):
+        stop = min(row + _BLUR_STRIPE_ROWS, height)
+        halo_stop = min(stop + pad, height)
+        # Noise must cover the halo rows before the blur of this stripe
+        # reads them.
+        if halo_stop > noised_until:
+            stripe = img[noised_until:halo_stop]
+            gauss = _noise_buffer(stripe.shape)  # Per-thread noise storage
+            cv2.randn(gauss, 0, sigma)  # Create gaussian noise as uint8
+            cv2.add(stripe, gauss, dst=stripe)  # Add gaussian noise in-place
+        noised_until = max(noised_until, halo_stop)
+        # Blur the stripe together with its halo rows but keep only the core
+        # rows, so the replicated stripe border never reaches the output and
+        # the result matches a whole-page blur exactly.
+        halo_start = max(row - pad, 0)
+        filtered = cv2.sepFilter2D(img[halo_start:halo_stop], -1,
+                                   gaussian_1d, gaussian_1d,
+                                   borderType=cv2.BORDER_REPLICATE)
+        blurred[row:stop] = filtered[row - halo_start:stop - halo_start]
+
+    return blurred
 
 
 def pdf_to_image(path_to_pdf, output_folder, dpi=100, blur=True, kernel=(5,5), sigma=1):
@@ -90,142 +297,212 @@ def pdf_to_image(path_to_pdf, output_folder, dpi=100, blur=True, kernel=(5,5), s
         blur (bool, optional): Whether blur is needed or not. Defaults to True.
         kernel (tuple, optional): Gaussian blur kernel size. Defaults to (5,5).
         sigma (float, optional): Gaussian blur sigma value. Defaults to 1.
+
+    Returns:
+        list of str: Paths of the written images, in page order.
     """
-    pages = convert_from_path(path_to_pdf, dpi, fmt='PNG')  # Convert to PNGs
-    for (page, j) in zip(pages, range(len(pages))): # Iterate over pages
-        png_output = os.path.join('.', os.path.join(output_folder, f'_{j}.png'))
+    # Rasterize with one Poppler worker per core. PPM pages decode much
+    # faster in Pillow than PNG and expose their pixels as a plain RGB
+    # buffer; pdftoppm emits PPM natively (pdftocairo does not support it).
+    pages = convert_from_path(path_to_pdf, dpi, fmt='ppm',
+                              thread_count=os.cpu_count())
+
+    def _process_page(page, j):
+        # Zero-padded page numbers keep lexicographic order equal to page
+        # order for any glob-based consumer of the folder.
+        jpg_output = os.path.join('.', os.path.join(output_folder, f'_{j:04d}.jpg'))
         # Required to harden optical character recognition (OCR) process
         if blur:
-            blurred_image = blur_image(page, kernel, sigma)  # Apply blurring
-            cv2.imwrite(png_output, blurred_image)  # Save blurred image
+            # Wrap the raw PPM buffer without an intermediate PIL copy
+            img = np.frombuffer(page.tobytes(), dtype=np.uint8)
+            img = img.reshape(page.height, page.width, 3)
+            blurred_image = blur_image(img, kernel, sigma)  # Apply blurring
+            # Swap RGB to BGR for imwrite, then save as JPEG. Encoding JPEG is
+            # far cheaper than PNG and quality 80 is plenty for noisy pages.
+            cv2.imwrite(jpg_output,
+                        cv2.cvtColor(blurred_image, cv2.COLOR_RGB2BGR),
+                        [cv2.IMWRITE_JPEG_QUALITY, 80, cv2.IMWRITE_JPEG_OPTIMIZE, 0])
         else:
-            page.save(png_output, 'PNG')  # Save non-blurry image
+            page.save(jpg_output, 'JPEG')  # Save non-blurry image
+
+        return jpg_output
+
+    # Pages are independent and the blur/imwrite calls release the GIL, so
+    # process them with a thread pool. OpenCV's internal threading is turned
+    # off to avoid oversubscribing cores with nested parallelism.
+    num_threads_before = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+    try:
+        # max(1, ...) keeps the pool valid when rasterization yields no pages.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(8, len(pages)))) as executor:
+            # map() yields the results in submission order, i.e. page order.
+            output_paths = list(executor.map(_process_page, pages, range(len(pages))))
+    finally:
+        cv2.setNumThreads(num_threads_before)
+
+    return output_paths
 
 
-def image_to_pdf(images_folder, output_folder, orientation, remove_artifacts=False):
-    """Writes PNG images in the input_folder onto A4 pages by scaling the size.
+def image_to_pdf(path_to_images, orientation, remove_artifacts=False):
+    """Wraps the given JPEG images into in-memory A4 PDFs.
 
-    If images are not proportional to the dimensions of A4, the written image may be
-    distorted. If you want to remove images after converting them to PDF,
-    set `remove_artifacts` to `True`.
+    The JPEG bytes are attached to the pages as-is through
+    `attach_jpeg_page`, so no image is decoded or re-encoded along the way.
+    If images are not proportional to the dimensions of A4, the displayed
+    image may be distorted. If you want to remove images after converting
+    them to PDF, set `remove_artifacts` to `True`.
 
     Args:
-        images_folder (str): Path to the folder that includes images.
-        output_folder (str): Path to the folder that PDFs will be saved
+        path_to_images (list of str): Paths of the input images in page
+            order, e.g. as returned by `pdf_to_image`.
         orientation (str): Orientation of page 'landscape' or 'portrait'.
-        remoremove_artifacts (bool, optional):
+        remove_artifacts (bool, optional):
             Whether to remove the input images or not. Defaults to False.
+
+    Returns:
+        list of io.BytesIO: Single-page PDFs, one per image, in page order.
     """
-    # Read all "*.png" images in the images_folder
-    path_to_images = sorted(glob.glob(os.path.join(images_folder,'*.png')))
-    # Iterate over images and save them seperate A4 PDFs
-    for (image,j) in zip(path_to_images, range(len(path_to_images))):
-        canvas_ = set_page(os.path.join(output_folder,f'tmp_{j}.pdf'), orientation)
-        draw_image(canvas_, image, orientation)  # Draw image to page
-        canvas_.save()  # save PDF
+    page_pdfs = []
+    # Iterate over images and attach them to seperate in-memory A4 PDFs
+    for image in path_to_images:
+        with Image.open(image) as header:  # Reads the size, no pixel decode
+            width, height = header.size
+        with open(image, 'rb') as jpeg_file:
+            jpeg = jpeg_file.read()
+        buffer = io.BytesIO()
+        pdf = pikepdf.Pdf.new()
+        attach_jpeg_page(pdf, jpeg, width, height, orientation)
+        pdf.save(buffer)
+        pdf.close()
+        page_pdfs.append(buffer)
         if remove_artifacts:
             os.remove(image)
 
+    return page_pdfs
 
-def merge_pdfs(input_folder, path_to_output_pdf, remove_artifacts=False):
-    """Merges given input PDFs and writes merged version to `output_pdf`
 
-    If `remove_artifacts` is `True`, then function removes input PDFs.
+def merge_pdfs(input_pdfs, path_to_output_pdf):
+    """Merges given input PDFs and writes merged version to `output_pdf`
 
     Args:
-        input_folder (str): PDFs that will be merged should be in this folder
+        input_pdfs (list): PDFs that will be merged, as file-like objects
+            (e.g. the io.BytesIO buffers returned by `image_to_pdf`).
         output_pdf (str): the path to output PDF, it both includes path and name
-        remove_artifacts (bool, optional):
-            Whether to remove the input file(s) or not. Defaults to False.
     """
     pdf_merger = PdfFileMerger()
-    input_pdfs = sorted(glob.glob(os.path.join(input_folder, "*.pdf")))
-    for path in input_pdfs:
-        pdf_merger.append(path)
+    for pdf in input_pdfs:
+        pdf.seek(0)
+        pdf_merger.append(pdf)
 
     with open(path_to_output_pdf, 'wb') as output_pdf:
         pdf_merger.write(output_pdf)
 
     pdf_merger.close()
 
-    if remove_artifacts:
-        for pdf in input_pdfs:
-            os.remove(pdf)
 
+def attach_jpeg_page(pdf, jpeg, width, height, orientation):
+    """Appends an A4 page showing the given JPEG to a pikepdf document.
 
-def pdf_to_image_to_pdf(input_pdf,
-                        tmp_folder,
-                        output_folder,
-                        orientation,
-                        remove_original=False,
-                        remove_artifacts=False):
-    """Converts PDF to images and merges as a PDF without blurring.
-
-    Set the `remove_artifacts` parameter to clear temporary files created during
-    the conversions. If it is `True`, temporary images and PDFs will be removed.
-    Set the `remove_original` to `True' if you want to remove the input PDF.
+    The JPEG bytes are attached as a /DCTDecode image XObject without being
+    decoded, and the page content stream only scales the image to the A4
+    dimensions of the requested `orientation`.
 
     Args:
-        input_pdf (str): Path to input PDF.
-        output_folder (str): Path to the folder that processed PDF will be saved.
-        remove_original (bool, optional):
-            Whether remove input_pdf or not. Defaults to False.
-        remove_artifacts (bool, optional):
-            Whether to remove the prior processed file(s) or not. Default=False.
-
-    Returns:
-        str: Path of processed PDF.
+        pdf (pikepdf.Pdf): Document that the page will be appended to.
+        jpeg (bytes): Encoded JPEG data of the page image.
+        width (int): Width of the JPEG in pixels.
+        height (int): Height of the JPEG in pixels.
+        orientation (str): Orientation of page 'landscape' or 'portrait'.
     """
-    file_name = input_pdf.split(os.sep)[-1].split('.')[0]
-    output_pdf = os.path.join(output_folder, file_name + '_im2pdf' + '.pdf')
-
-    pdf_to_image(input_pdf, tmp_folder, blur=False)
-    image_to_pdf(tmp_folder, tmp_folder, orientation, remove_artifacts)
-    merge_pdfs(tmp_folder, output_pdf, remove_artifacts)
-
-    if remove_original:
-        os.remove(input_pdf)
-
-    return output_pdf
+    if orientation == 'landscape':
+        page_width, page_height = A4[1], A4[0]
+    else:
+        page_width, page_height = A4[0], A4[1]
+
+    image = pdf.make_stream(jpeg)
+    image.Type = pikepdf.Name.XObject
+    image.Subtype = pikepdf.Name.Image
+    image.Width = width
+    image.Height = height
+    image.ColorSpace = pikepdf.Name.DeviceRGB
+    image.BitsPerComponent = 8
+    image.Filter = pikepdf.Name.DCTDecode
+
+    content = f'q {page_width:.2f} 0 0 {page_height:.2f} 0 0 cm /Im0 Do Q'
+    page = pikepdf.Dictionary(
+        Type=pikepdf.Name.Page,
+        MediaBox=[0, 0, page_width, page_height],
+        Resources=pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=image)),
+        Contents=pdf.make_stream(content.encode('ascii')),
+        )
+    # pikepdf 2.x only accepts plain object handles in PageList (wrapping
+    # in pikepdf.Page raises TypeError there), while later majors demand
+    # the pikepdf.Page wrapper, so try the 2.x form first.
+    page = pdf.make_indirect(page)
+    try:
+        pdf.pages.append(page)
+    except TypeError:
+        pdf.pages.append(pikepdf.Page(page))
 
 
 def blur_pages_of_pdf(input_pdf,
                       orientation,
-                      tmp_folder,
                       output_folder,
                       dpi=100,
                       kernel=(5,5),
                       sigma=1,
-                      remove_artifacts=False,
                       ):
-    """Converts content of PDFs to images, blurs and then merges again
+    """Rasterizes pages of PDF, blurs them and builds the output PDF directly
 
-    Set the `remove_artifacts` parameter to `True` if you want to clear
-    temporary files created during the conversion operations.
+    Each rasterized page is blurred, encoded once to JPEG and attached to a
+    single pikepdf document as an image XObject, so no intermediate image or
+    single-page PDF files are written and nothing is re-parsed or re-encoded.
 
     Args:
         input_pdf (str): Path to input PDF
         orientation (str): Orientation of page 'landscape' or 'portrait'
-        tmp_folder (str): Path to tmp folder that midproducts will be saved.
         output_folder (str): Path to the folder that processed PDF will be saved.
         dpi (int, optional): Dots Per Inch, conversion parameter. Default = 100.
         kernel (tuple, optional): Gaussian blur kernel size. Defaults to (5,5).
         sigma (float, optional): Gaussian blur sigma value. Defaults to 1.
-        remove_artifacts (bool, optional):
-            Whether to remove the prior processed file(s) or not. Default=False.
 
     Returns:
         [str]: path of output PDF
     """
     file_name = input_pdf.split(os.sep)[-1].split('.')[0]
     output_pdf = os.path.join(output_folder, file_name + '_blurred' + '.pdf')
-    # Convert pages of PDF to images and save to `tmp_folder`
-    pdf_to_image(input_pdf, tmp_folder, dpi, True, kernel, sigma)
-    # Write images to A4 PDF pages with `orientation` and save to `tmp_folder`
-    image_to_pdf(tmp_folder, tmp_folder, orientation, remove_artifacts)
-    # Merge PDFs in `tmp_folder` and write to `output_folder`
-    # Remove PDFs in tmp_folder after writing operation
-    merge_pdfs(tmp_folder, output_pdf, remove_artifacts)
+    # Rasterize with one Poppler worker per core, see `pdf_to_image`.
+    pages = convert_from_path(input_pdf, dpi, fmt='ppm',
+                              thread_count=os.cpu_count())
+
+    def _encode_page(page):
+        # Wrap the raw PPM buffer without an intermediate PIL copy
+        img = np.frombuffer(page.tobytes(), dtype=np.uint8)
+        img = img.reshape(page.height, page.width, 3)
+        blurred_image = blur_image(img, kernel, sigma)  # Apply blurring
+        # `blur_image` keeps the RGB channel order of the rasterized page,
+        # while imencode expects BGR, so swap the channels before encoding.
+        _, jpeg = cv2.imencode('.jpg',
+                               cv2.cvtColor(blurred_image, cv2.COLOR_RGB2BGR),
+                               [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return jpeg.tobytes(), blurred_image.shape[1], blurred_image.shape[0]
+
+    # Blur and encode the pages in parallel, see `pdf_to_image` for details.
+    num_threads_before = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+    try:
+        # max(1, ...) keeps the pool valid when rasterization yields no pages.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(8, len(pages)))) as executor:
+            encoded_pages = list(executor.map(_encode_page, pages))
+    finally:
+        cv2.setNumThreads(num_threads_before)
+
+    # Document assembly is cheap, append the pages serially in order.
+    pdf = pikepdf.Pdf.new()
+    for jpeg, width, height in encoded_pages:
+        attach_jpeg_page(pdf, jpeg, width, height, orientation)
+    pdf.save(output_pdf)
+    pdf.close()
 
     return output_pdf
 
@@ -249,18 +526,17 @@ def add_watermark(input_pdf, watermark, output_folder, remove_original=False):
     """
     file_name = input_pdf.split(os.sep)[-1].split('.')[0]  # remove '.pdf'
     output_pdf = os.path.join(output_folder, file_name + '_watermarked' + '.pdf')
-    watermark_page = PdfFileReader(watermark).getPage(0)  # Read watermark
 
-    pdf_reader = PdfFileReader(input_pdf)  # Create reader object
-    pdf_writer = PdfFileWriter()  # Create writer object
-
-    for i in range(pdf_reader.getNumPages()):  # Add watermark to each page
-        page = pdf_reader.getPage(i)  # Get the page with number i
-        page.mergePage(watermark_page)  # Add watermark
-        pdf_writer.addPage(page)  # add page to the writer object
-
-    with open(output_pdf, 'wb') as out:
-        pdf_writer.write(out)  # Write all watermarked pages to out file
+    # Overlaying with pikepdf keeps the watermark's content stream as a
+    # single shared object instead of copying it onto every page.
+    with pikepdf.Pdf.open(watermark) as watermark_pdf, \
+         pikepdf.Pdf.open(input_pdf) as pdf:
+        watermark_page = watermark_pdf.pages[0]  # Read watermark
+        for page in pdf.pages:  # Add watermark to each page
+            # pikepdf 2.x yields raw dictionaries here and add_overlay only
+            # exists on the Page helper; wrapping is a no-op on later majors.
+            pikepdf.Page(page).add_overlay(watermark_page)
+        pdf.save(output_pdf)
 
     if remove_original:
         os.remove(input_pdf)
@@ -272,9 +548,9 @@ def move_processed_pdf(input_pdf, processed_folder):
     """Moves `input_pdf` to `processed_folder`.
 
     If there is a PDF with same name in the `processed_folder`, instead of
-    overwriting the PDF in the `processed_folder`, this function adds a postfix
-    constructed as `"_exists_" + f'{rnd}' + ".pdf"`. `rnd` is a uniformly
-    generated random number which takes values in [0,100].
+    overwriting the PDF in the `processed_folder`, this function adds a
+    nanosecond timestamp postfix to the file name, which cannot collide
+    with an earlier move.
 
     Args:
         input_pdf (str): Path to input PDF.
@@ -283,20 +559,10 @@ def move_processed_pdf(input_pdf, processed_folder):
     # Extract file name
     file_name = input_pdf.split(os.sep)[-1].split('.')[0]
     # Define path to move PDF
-    new_path_to_input_pdf = os.path.join(processed_folder, file_name + '.pdf')
-    if os.path.exists(new_path_to_input_pdf):  # Check whether PDF exists or not
-        rnd = np.random.randint(0,100)  # Generate a random number to postfix
-        try:
-            postfix = "_exists_" + f'{rnd}' + ".pdf"  # Create postfix
-            file_name = file_name + postfix  # Add postfix to file_name
-            # Define path to move postfix added PDF
-            if_input_pdf_is_exists = os.path.join(processed_folder, file_name)
-            os.rename(input_pdf, if_input_pdf_is_exists)  # Move PDF
-        except Exception as error:
-            print("Bad luck, random function returned an existing number\n")
-            raise error
-    else:
-        os.rename(input_pdf, new_path_to_input_pdf)
+    new_path = pathlib.Path(processed_folder) / f'{file_name}.pdf'
+    if new_path.exists():  # Postfix a timestamp instead of overwriting
+        new_path = new_path.with_name(f'{file_name}_{time.time_ns()}.pdf')
+    os.replace(input_pdf, new_path)  # Atomic move
 
 
 def encrypt_and_add_metadata(input_pdf,
@@ -324,43 +590,18 @@ def encrypt_and_add_metadata(input_pdf,
     # Set output path of PDF
     output_pdf = os.path.join(output_folder, file_name + '_final' + '.pdf')
 
-    # Metadata sections of PDF. For more information visit the link below.
-    # https://www.adobe.io/open/standards/xmp.html#!adobe/xmp-docs/master/Namespaces.md
-    # Dublin Core namespace: dc:title, dc:creator, dc:description, dc:subject, dc:format, dc:rights
-    # XMP basic namespace: xmp:CreateDate, xmp:CreatorTool, xmp:ModifyDate, xmp:MetadataDate
-    # XMP rights management namespace: xmpRights:WebStatement, xmpRights:Marked
-    # XMP media management namespace: xmpMM:DocumentID
-    pdf  = pikepdf.Pdf.open(input_pdf)  # Read PDF
-    with pdf.open_metadata() as meta:  # Add Metadata
-        meta['dc:title'] = 'Lecture Notes'
-        meta['dc:creator'] = 'Serhan Yarkan, Tapir Lab.'  # Author
-        meta['dc:description'] = 'Tapir Lab. Fall-2020 Lecture Notes'
-        meta['dc:subject'] = 'Probability, statistics, communications...\n\
-            ALL HAIL TAPIR!\n\
-            tapirlab.com'  # Keywords
-        meta['dc:rights'] = 'Tapir Lab. License'
-        meta['xmp:CreateDate'] = datetime.today().isoformat()
-        meta['xmp:ModifyDate'] = datetime.today().isoformat()
-        meta['xmp:CreatorTool'] = "Tapir Lab.'s Automatic Watermarking Script"
-        meta['xmpRights:WebStatement'] = "http://www.tapirlab.com"
-
-    # Set permissions of user
-    permissions = pikepdf.Permissions(
-        accessibility=False,
-        extract=False,
-        modify_annotation=False,
-        modify_assembly=False,
-        modify_form=False,
-        modify_other=False,
-        print_lowres=True,
-        print_highres=True,
-        )
-
-    # Save PDF with added metadata and restricted permissions.
-    pdf.save(output_pdf, encryption=pikepdf.Encryption(user=usr_pass,
-                                                       owner=owner_pass,
-                                                       allow=permissions,
-                                                       ))
+    now = datetime.now(timezone.utc).isoformat()  # Single timestamp for both dates
+    # Memory-map the input instead of reading it into RAM at once.
+    pdf = pikepdf.open(input_pdf, access_mode=pikepdf.AccessMode.mmap)
+    with pdf.open_metadata() as meta:  # Add Metadata, see `_METADATA` above
+        for key, value in _METADATA.items():
+            meta[key] = value
+        meta['xmp:CreateDate'] = now
+        meta['xmp:ModifyDate'] = now
+
+    # Save PDF with added metadata and restricted permissions. The
+    # encryption setup is shared across calls with the same passwords.
+    pdf.save(output_pdf, encryption=_encryption(usr_pass, owner_pass))
     # Close PDF object
     pdf.close()
 